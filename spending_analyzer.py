@@ -3,12 +3,17 @@ import numpy as np
 from pathlib import Path
 import re
 from datetime import datetime
-import plotly.express as px
 import plotly.graph_objects as go
+from concurrent.futures import ThreadPoolExecutor
 
 class SpendingAnalyzer:
     def __init__(self):
         self.data = None
+        
+        # Aggregates cached by process_files
+        self._monthly = None
+        self._by_cat = None
+        self._by_merchant = None
         self.categories = {
             'groceries': ['grocery', 'food', 'market', 'trader', 'whole foods'],
             'dining': ['restaurant', 'cafe', 'coffee', 'doordash', 'uber eats'],
@@ -18,118 +23,260 @@ class SpendingAnalyzer:
             'entertainment': ['netflix', 'spotify', 'movie', 'theater'],
             'health': ['pharmacy', 'doctor', 'medical', 'fitness'],
         }
+        
+        # Precompile all keywords into one regex with a named group per category.
+        # Each group is a lookahead anchored at the start, so the first category
+        # (in dict order) with any keyword in the description wins, instead of
+        # whichever keyword appears leftmost. Matching ignores case.
+        self._combined_re = re.compile('^(?:' + '|'.join(
+            f'(?P<{category}>(?=.*?(?:{"|".join(map(re.escape, keywords))})))'
+            for category, keywords in self.categories.items()
+        ) + ')', re.DOTALL | re.IGNORECASE)
+        
+        # Fixed category order so groupbys, plots and exports are stable
+        self._category_dtype = pd.CategoricalDtype(list(self.categories) + ['other'])
     
     def read_csv(self, filepath):
-        """Read a CSV file and standardize the format"""
-        df = pd.read_csv(filepath)
+        """Read a CSV file (a path or file-like object) and standardize the format"""
+        # Read the header and the first rows only, to pick the columns we need
+        sample = pd.read_csv(self._rewind(filepath), nrows=200)
+        cols_lower = {col.lower(): col for col in sample.columns}
         
-        # Try to identify date and amount columns
-        date_col = None
-        amount_col = None
+        # Match the header names, never giving one column two roles. A date
+        # column picked by name must still parse as dates in the sample.
+        date_col = self._find_column(cols_lower, r'date', r'posted|trans')
+        if date_col is not None and not self._parses_as_dates(sample[date_col]):
+            date_col = None
+        amount_col = self._find_column(cols_lower, r'amount', r'debit|credit|value', exclude=(date_col,))
+        desc_col = self._find_column(
+            cols_lower, r'desc', r'merchant|payee|memo|details|name', exclude=(date_col, amount_col)
+        )
         
+        # Otherwise infer them from the sample values
         # Look for date columns
-        for col in df.columns:
-            if df[col].dtype == 'object':
-                try:
-                    pd.to_datetime(df[col])
+        if date_col is None:
+            for col in sample.columns:
+                if col not in (amount_col, desc_col) and self._parses_as_dates(sample[col]):
                     date_col = col
                     break
-                except:
-                    continue
         
         # Look for amount columns
-        for col in df.columns:
-            if df[col].dtype in ['float64', 'int64'] or (
-                df[col].dtype == 'object' and df[col].str.contains(r'[\d\.\-\$]').all()
-            ):
-                amount_col = col
-                break
+        if amount_col is None:
+            for col in sample.columns:
+                if col not in (date_col, desc_col) and (sample[col].dtype in ['float64', 'int64'] or (
+                    sample[col].dtype == 'object' and sample[col].str.contains(r'[\d\.\-\$]').all()
+                )):
+                    amount_col = col
+                    break
+        
+        # Use the first remaining text column as the description
+        if desc_col is None:
+            text_cols = sample.select_dtypes(include=['object']).columns.drop(
+                [date_col, amount_col], errors='ignore'
+            )
+            if not text_cols.empty:
+                desc_col = text_cols[0]
         
         if not date_col or not amount_col:
             raise ValueError("Could not identify date and amount columns")
+        if not desc_col:
+            raise ValueError("Could not identify a description column")
+        
+        # Parse only the needed columns with the multithreaded Arrow reader
+        df = pd.read_csv(self._rewind(filepath), engine='pyarrow', usecols=[date_col, desc_col, amount_col],
+                         dtype_backend='pyarrow')
+        
+        # Numeric amount columns pass straight through. Text ones get '$' and ','
+        # stripped with plain substring replaces, which run as pyarrow.compute
+        # kernels on Arrow strings instead of a regex per cell.
+        amounts = df[amount_col]
+        if not pd.api.types.is_numeric_dtype(amounts):
+            amounts = pd.to_numeric(
+                amounts.astype('string[pyarrow]')
+                .str.replace('$', '', regex=False)
+                .str.replace(',', '', regex=False)
+            )
             
-        # Standardize the dataframe
+        # Standardize the dataframe (the date column is parsed only here).
+        # Descriptions stay Arrow-backed, as pandas' string dtype so the .str
+        # regex methods used for categorization are available.
         standardized = pd.DataFrame({
             'date': pd.to_datetime(df[date_col]),
-            'description': df.select_dtypes(include=['object']).iloc[:, 0],
-            'amount': pd.to_numeric(df[amount_col].astype(str).str.replace('[\$,]', '', regex=True))
+            'description': df[desc_col].astype('string[pyarrow]'),
+            # float32 keeps cent precision for amounts below $131,072 at half the bytes
+            'amount': amounts.astype('float32')
         })
         
         return standardized
     
+    def _rewind(self, filepath):
+        """Seek file-like sources back to the start so they can be read again"""
+        if hasattr(filepath, 'seek'):
+            filepath.seek(0)
+        return filepath
+    
+    def _find_column(self, cols_lower, *patterns, exclude=()):
+        """Return the first column whose lowercased name matches a pattern, trying patterns in order"""
+        for pattern in patterns:
+            for name, col in cols_lower.items():
+                if col not in exclude and re.search(pattern, name):
+                    return col
+        return None
+    
+    def _parses_as_dates(self, values):
+        """Check whether a text column parses as dates"""
+        if values.dtype != 'object':
+            return False
+        try:
+            pd.to_datetime(values)
+            return True
+        except (ValueError, TypeError):
+            return False
+    
     def categorize_transaction(self, description):
         """Categorize a transaction based on its description"""
-        description = description.lower()
+        match = self._combined_re.match(description)
+        return match.lastgroup if match else 'other'
+    
+    def _categorize_series(self, desc):
+        """Categorize a whole Series of descriptions in a single regex pass"""
+        if not isinstance(desc.dtype, pd.CategoricalDtype):
+            desc = desc.astype('category')
+        
+        # Match each distinct description once, case-insensitively so no
+        # lowercased copy is built; the extracted groups are in category
+        # order, so the first matching group is the category code
+        extracted = desc.cat.categories.to_series().str.extract(self._combined_re)
+        matched = extracted.notna().to_numpy()
+        other = len(self.categories)
+        lookup = np.where(matched.any(axis=1), matched.argmax(axis=1), other).astype(np.int8)
         
-        for category, keywords in self.categories.items():
-            if any(keyword in description for keyword in keywords):
-                return category
-        return 'other'
+        # Broadcast the int8 codes to every row; missing descriptions have code -1,
+        # which picks the 'other' code appended at the end
+        codes = np.append(lookup, np.int8(other))[desc.cat.codes.to_numpy()]
+        return pd.Series(pd.Categorical.from_codes(codes, dtype=self._category_dtype), index=desc.index)
     
-    def process_files(self, filepaths):
-        """Process multiple CSV files and combine them"""
+    def process_files(self, filepaths, names=None):
+        """Process multiple CSV files and combine them, using names (if given) in error messages"""
+        filepaths = list(filepaths)
+        if names is None:
+            names = [
+                filepath if isinstance(filepath, (str, Path)) else f"file {i + 1}"
+                for i, filepath in enumerate(filepaths)
+            ]
+        
+        # Parse files concurrently; the CSV readers release the GIL
         dfs = []
-        for filepath in filepaths:
-            try:
-                df = self.read_csv(filepath)
-                dfs.append(df)
-            except Exception as e:
-                print(f"Error processing {filepath}: {str(e)}")
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(filepaths)))) as executor:
+            futures = [(name, executor.submit(self.read_csv, filepath)) for name, filepath in zip(names, filepaths)]
+            for name, future in futures:
+                try:
+                    dfs.append(future.result())
+                except Exception as e:
+                    print(f"Error processing {name}: {str(e)}")
                 
         if not dfs:
             raise ValueError("No valid files to process")
             
-        # Combine all dataframes
-        self.data = pd.concat(dfs, ignore_index=True)
+        # Combine all dataframes column by column; descriptions become integer
+        # codes so the sort, dedup and later groupbys never compare strings
+        dates = np.concatenate([df['date'].to_numpy('datetime64[ns]').view('i8') for df in dfs])
+        amounts = np.concatenate([df['amount'].to_numpy(np.float32) for df in dfs])
+        desc_codes, desc_values = pd.factorize(pd.concat([df['description'] for df in dfs], ignore_index=True))
         
-        # Remove duplicates
-        self.data = self.data.drop_duplicates()
+        # Sort once by (date, amount, description), which puts duplicates next to each other
+        order = np.lexsort((desc_codes, amounts, dates))
+        dates, amounts, desc_codes = dates[order], amounts[order], desc_codes[order]
         
-        # Sort by date
-        self.data = self.data.sort_values('date')
+        # Remove duplicates by dropping rows equal to the row before them;
+        # blank (NaN) amounts count as equal, like in drop_duplicates
+        same_amount = (amounts[1:] == amounts[:-1]) | (np.isnan(amounts[1:]) & np.isnan(amounts[:-1]))
+        keep = np.ones(len(dates), dtype=bool)
+        keep[1:] = (dates[1:] != dates[:-1]) | ~same_amount | (desc_codes[1:] != desc_codes[:-1])
+        
+        self.data = pd.DataFrame({
+            'date': dates[keep].view('M8[ns]'),
+            'description': pd.Categorical.from_codes(desc_codes[keep], categories=desc_values),
+            'amount': amounts[keep],
+        })
         
         # Add categories
-        self.data['category'] = self.data['description'].apply(self.categorize_transaction)
+        self.data['category'] = self._categorize_series(self.data['description'])
+        
+        # Month bucket of each transaction, as months since 1970-01 (int16 lasts
+        # until year 4700). NaT would wrap to 0 (1970-01) when narrowed, so
+        # undated rows get the int16 minimum as an explicit "no month" key.
+        months = self.data['date'].values.astype('datetime64[M]').astype('int64')
+        months[self.data['date'].isna().to_numpy()] = np.iinfo(np.int16).min
+        self.data['_month'] = months.astype('int16')
+        
+        # Give every column its own freshly allocated buffer before grouping, so
+        # the cached groupbys below never run over a view of a shared 2-D block
+        self.data = self.data.copy()
+        assert all(
+            self.data[col].to_numpy().flags['C_CONTIGUOUS'] for col in ['amount', '_month']
+        ), "numeric columns should be contiguous before grouping"
+        
+        # Cache the aggregates shared by insights, plots and the Excel export.
+        # The frame is already sorted by date, so each month is one contiguous
+        # run and groupbys skip re-sorting keys; categories keep their
+        # configured order, which is just their codes.
+        # Transactions without a date belong to no month
+        dated = self.data['date'].notna().to_numpy()
+        months, totals = self._sum_by_run(
+            self.data['_month'].to_numpy()[dated], self.data['amount'].to_numpy()[dated]
+        )
+        self._monthly = pd.Series(totals, index=self._month_labels(months), name='amount').round(2)
+        # Like the total and the monthly sums, these accumulate in float64
+        amounts64 = self.data['amount'].astype('float64')
+        self._by_cat = amounts64.groupby(self.data['category'], observed=True).sum().round(2)
+        self._by_merchant = amounts64.groupby(
+            self.data['description'], sort=False, observed=True
+        ).sum().round(2)
         
         return self.data
     
+    def _sum_by_run(self, keys, values):
+        """Sum values over runs of equal consecutive keys, skipping NaN like groupby sum"""
+        if len(keys) == 0:
+            return keys, np.zeros(0, dtype=np.float64)
+        
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        return keys[starts], np.add.reduceat(np.where(np.isnan(values), 0, values), starts, dtype=np.float64)
+    
+    def _month_labels(self, months):
+        """Convert months since 1970-01 to YYYY-MM labels for display"""
+        return pd.Index(np.asarray(months).astype('datetime64[M]').astype(str), name='month')
+    
     def generate_insights(self):
         """Generate spending insights"""
         if self.data is None:
             raise ValueError("No data available. Please process files first.")
             
         insights = {
-            'total_spending': self.data['amount'].sum(),
-            'avg_monthly_spending': self.data.groupby(
-                self.data['date'].dt.to_period('M')
-            )['amount'].sum().mean(),
-            'spending_by_category': self.data.groupby('category')['amount'].sum().to_dict(),
-            'top_merchants': self.data.groupby('description')['amount'].sum().nlargest(5).to_dict(),
-            'monthly_trend': self.data.groupby(
-                self.data['date'].dt.to_period('M')
-            )['amount'].sum().to_dict()
+            'total_spending': round(float(self.data['amount'].astype('float64').sum()), 2),
+            'avg_monthly_spending': float(self._monthly.mean()),
+            'spending_by_category': self._by_cat,
+            'top_merchants': self._by_merchant.nlargest(5),
+            'monthly_trend': self._monthly
         }
         
         return insights
     
-    def plot_spending_trends(self):
-        """Create visualizations of spending trends"""
+    def plot_spending_trends(self, max_months=60):
+        """Create visualizations of spending trends from the cached aggregates"""
         if self.data is None:
             raise ValueError("No data available. Please process files first.")
             
-        # Monthly spending trend
-        monthly_spending = self.data.groupby(
-            self.data['date'].dt.to_period('M')
-        )['amount'].sum().reset_index()
-        monthly_spending['date'] = monthly_spending['date'].astype(str)
+        # Monthly spending trend, limited to the most recent months
+        monthly_spending = self._monthly.tail(max_months)
         
-        fig1 = px.line(monthly_spending, x='date', y='amount',
-                      title='Monthly Spending Trend')
+        fig1 = go.Figure(go.Scatter(x=monthly_spending.index, y=monthly_spending.to_numpy(), mode='lines'))
+        fig1.update_layout(title='Monthly Spending Trend', xaxis_title='date', yaxis_title='amount')
         
         # Spending by category
-        category_spending = self.data.groupby('category')['amount'].sum().reset_index()
-        fig2 = px.pie(category_spending, values='amount', names='category',
-                      title='Spending by Category')
+        fig2 = go.Figure(go.Pie(labels=self._by_cat.index.astype(str), values=self._by_cat.to_numpy()))
+        fig2.update_layout(title='Spending by Category')
         
         return fig1, fig2
     
@@ -138,9 +285,13 @@ class SpendingAnalyzer:
         if self.data is None:
             raise ValueError("No data available. Please process files first.")
             
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
+        # constant_memory streams each row to disk as soon as the next one starts
+        with pd.ExcelWriter(output_path, engine='xlsxwriter',
+                            engine_kwargs={'options': {'constant_memory': True}}) as writer:
             # Write transaction data
-            self.data.to_excel(writer, sheet_name='Transactions', index=False)
+            transactions = self.data.drop(columns='_month')
+            transactions['amount'] = transactions['amount'].astype('float64').round(2)
+            self._write_sheet(writer, 'Transactions', transactions)
             
             # Write summary data
             insights = self.generate_insights()
@@ -150,23 +301,36 @@ class SpendingAnalyzer:
                 'Metric': ['Total Spending', 'Average Monthly Spending'],
                 'Value': [insights['total_spending'], insights['avg_monthly_spending']]
             }
-            pd.DataFrame(summary_data).to_excel(writer, sheet_name='Summary', index=False)
+            self._write_sheet(writer, 'Summary', pd.DataFrame(summary_data))
             
             # Write category spending
-            category_spending = pd.DataFrame.from_dict(
-                insights['spending_by_category'], 
-                orient='index',
-                columns=['Amount']
-            )
-            category_spending.to_excel(writer, sheet_name='Category Spending')
+            category_spending = insights['spending_by_category'].to_frame('Amount')
+            self._write_sheet(writer, 'Category Spending', category_spending.rename_axis('Category').reset_index())
             
             # Write monthly trend
-            monthly_trend = pd.DataFrame.from_dict(
-                insights['monthly_trend'],
-                orient='index',
-                columns=['Amount']
-            )
-            monthly_trend.to_excel(writer, sheet_name='Monthly Trend')
+            monthly_trend = insights['monthly_trend'].to_frame('Amount')
+            self._write_sheet(writer, 'Monthly Trend', monthly_trend.rename_axis('Month').reset_index())
+    
+    def _write_sheet(self, writer, sheet_name, frame):
+        """Write a dataframe to a new sheet one row at a time"""
+        # DataFrame.to_excel writes column by column, which constant_memory
+        # mode would silently truncate, so rows are written in order here
+        worksheet = writer.book.add_worksheet(sheet_name)
+        date_format = writer.book.add_format({'num_format': 'yyyy-mm-dd'})
+        for col, dtype in enumerate(frame.dtypes):
+            if pd.api.types.is_datetime64_any_dtype(dtype):
+                worksheet.set_column(col, col, 12, date_format)
+        
+        worksheet.write_row(0, 0, frame.columns)
+        for row, values in enumerate(frame.itertuples(index=False), start=1):
+            worksheet.write_row(row, 0, [None if pd.isna(v) else v for v in values])
+    
+    def export_to_parquet(self, output_path):
+        """Export the transaction data to Parquet, much faster and smaller than Excel"""
+        if self.data is None:
+            raise ValueError("No data available. Please process files first.")
+        
+        self.data.drop(columns='_month').to_parquet(output_path, index=False)
 
 # Example usage
 if __name__ == "__main__":
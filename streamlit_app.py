@@ -1,12 +1,30 @@
 import streamlit as st
-import pandas as pd
+import io
 from spending_analyzer import SpendingAnalyzer
-import plotly.express as px
-from pathlib import Path
-import tempfile
 
 st.set_page_config(page_title="Personal Spending Analyzer", layout="wide")
 
+@st.cache_data(show_spinner=False)
+def analyze(file_bytes, file_names):
+    """Run the whole analysis pipeline once per distinct set of uploaded files"""
+    analyzer = SpendingAnalyzer()
+    
+    # Parse the uploaded bytes in memory, no temporary files needed
+    analyzer.process_files([io.BytesIO(content) for content in file_bytes], names=file_names)
+    
+    return {
+        'analyzer': analyzer,
+        'insights': analyzer.generate_insights(),
+        'figs': analyzer.plot_spending_trends(),
+    }
+
+@st.cache_data(show_spinner=False)
+def excel_report(file_bytes, file_names):
+    """Build the Excel report once per distinct set of uploaded files"""
+    output = io.BytesIO()
+    analyze(file_bytes, file_names)['analyzer'].export_to_excel(output)
+    return output.getvalue()
+
 st.title("Personal Spending Analyzer")
 
 st.write("""
@@ -19,20 +37,12 @@ uploaded_files = st.file_uploader("Choose CSV files", accept_multiple_files=True
 
 if uploaded_files:
     try:
-        analyzer = SpendingAnalyzer()
-        
-        # Save uploaded files temporarily
-        temp_paths = []
-        for uploaded_file in uploaded_files:
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.csv') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                temp_paths.append(tmp_file.name)
-        
-        # Process the files
-        data = analyzer.process_files(temp_paths)
-        
-        # Generate insights
-        insights = analyzer.generate_insights()
+        # Process the files, generate insights and plots (cached on their
+        # contents, so widget reruns skip the whole pipeline)
+        file_bytes = tuple(f.getvalue() for f in uploaded_files)
+        file_names = tuple(f.name for f in uploaded_files)
+        results = analyze(file_bytes, file_names)
+        insights = results['insights']
         
         # Create two columns
         col1, col2 = st.columns(2)
@@ -43,43 +53,28 @@ if uploaded_files:
             st.write(f"Average Monthly Spending: ${insights['avg_monthly_spending']:,.2f}")
             
             st.subheader("Top Spending Categories")
-            category_data = pd.DataFrame.from_dict(
-                insights['spending_by_category'], 
-                orient='index',
-                columns=['Amount']
-            ).sort_values('Amount', ascending=False)
+            category_data = insights['spending_by_category'].sort_values(ascending=False).to_frame('Amount')
             st.dataframe(category_data)
         
         with col2:
             st.subheader("Top Merchants")
-            merchant_data = pd.DataFrame.from_dict(
-                insights['top_merchants'],
-                orient='index',
-                columns=['Amount']
-            )
+            merchant_data = insights['top_merchants'].to_frame('Amount')
             st.dataframe(merchant_data)
         
         # Display visualizations
         st.subheader("Spending Trends")
-        trend_plot, category_plot = analyzer.plot_spending_trends()
+        trend_plot, category_plot = results['figs']
         st.plotly_chart(trend_plot, use_container_width=True)
         st.plotly_chart(category_plot, use_container_width=True)
         
         # Export button
         if st.button("Export to Excel"):
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                analyzer.export_to_excel(tmp_file.name)
-                with open(tmp_file.name, 'rb') as f:
-                    st.download_button(
-                        label="Download Excel file",
-                        data=f,
-                        file_name="spending_analysis.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                    )
-        
-        # Cleanup temporary files
-        for path in temp_paths:
-            Path(path).unlink()
+            st.download_button(
+                label="Download Excel file",
+                data=excel_report(file_bytes, file_names),
+                file_name="spending_analysis.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
             
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")